@@ -3,7 +3,9 @@ from __future__ import annotations
 import os
 import shlex
 import shutil
+import subprocess
 import sys
+import threading
 from pathlib import Path
 from textwrap import dedent
 
@@ -24,6 +26,12 @@ nox.options.sessions = ["black", "isort", "pre-commit", "pylint", "mypy", "tests
 
 python_versions = ["3.9"]
 
+# Sessions run by `all_parallel`. The formatting sessions edit the sources, so they
+# run first, one after the other. The other groups only read them, so they then run
+# concurrently, each in its own nox process.
+formatting_sessions = ["black", "isort"]
+parallel_session_groups = [["pylint"], ["mypy"], ["tests"]]
+
 
 def activate_virtualenv_in_precommit_hooks(session: Session) -> None:
     """Activate virtualenv in hooks installed by pre-commit.
@@ -113,16 +121,7 @@ def precommit(session: Session) -> None:
     #     activate_virtualenv_in_precommit_hooks(session)
 
 
-# @nox.session
-# def lint(session: nox.Session) -> None:
-#     """
-#     Run the linter.
-#     """
-#     session.install("pre-commit")
-#     session.run("pre-commit", "run", "--all-files", *session.posargs)
-
-
-@nox.session
+@nox.session(reuse_venv=True)
 def pylint(session: nox.Session) -> None:
     """
     Run PyLint.
@@ -133,13 +132,16 @@ def pylint(session: nox.Session) -> None:
     session.run("pylint", "src", *session.posargs)
 
 
-@nox.session
+@nox.session(reuse_venv=True)
 def tests(session: nox.Session) -> None:
     """
-    Run the unit and regular tests.
+    Run the unit and regular tests. Pass "--cached" to reuse the pytest cache,
+    running previously failed tests first.
     """
+    args = [arg for arg in session.posargs if arg != "--cached"]
+    cache_args = ["--ff"] if "--cached" in session.posargs else ["--cache-clear"]
     session.install(".[test]")
-    session.run("pytest", *session.posargs)
+    session.run("pytest", *cache_args, *args)
 
 
 @nox.session
@@ -177,7 +179,7 @@ def build(session: nox.Session) -> None:
 locations = "src", "tests", "noxfile.py"
 
 
-@nox.session
+@nox.session(reuse_venv=True)
 def black(session: nox.Session) -> None:
     """Run black code formatter."""
     args = session.posargs or locations
@@ -194,7 +196,7 @@ def black(session: nox.Session) -> None:
 #     session.run("codecov", *session.posargs)
 
 
-@nox.session
+@nox.session(reuse_venv=True)
 def isort(session: nox.Session) -> None:
     """
     Run iSort.
@@ -207,7 +209,7 @@ def isort(session: nox.Session) -> None:
 mypy_locations = "src", "tests"
 
 
-@nox.session()
+@nox.session(reuse_venv=True)
 def mypy(session: nox.Session) -> None:
     """
     Run MyPy.
@@ -216,3 +218,41 @@ def mypy(session: nox.Session) -> None:
     args = session.posargs or mypy_locations
     session.install("mypy")
     session.run("mypy", *args)
+
+
+@nox.session(python=False)
+def all_parallel(session: nox.Session) -> None:
+    """
+    Run the formatters, then the read-only sessions concurrently, each group in its own nox process.
+    """
+    session.run(sys.executable, "-m", "nox", "-s", *formatting_sessions, external=True)
+    output_lock = threading.Lock()
+
+    def stream(label: str, process: subprocess.Popen[str]) -> None:
+        assert process.stdout is not None
+        for line in process.stdout:
+            with output_lock:
+                print(f"[{label}] {line}", end="", flush=True)
+
+    processes = {}
+    for group in parallel_session_groups:
+        label = "+".join(group)
+        processes[label] = subprocess.Popen(
+            [sys.executable, "-m", "nox", "-s", *group],
+            cwd=DIR,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            text=True,
+        )
+    streams = [
+        threading.Thread(target=stream, args=(label, process))
+        for label, process in processes.items()
+    ]
+    for thread in streams:
+        thread.start()
+    for thread in streams:
+        thread.join()
+
+    failed = [label for label, process in processes.items() if process.wait() != 0]
+    if failed:
+        session.error(f"Failed sessions: {', '.join(failed)}")
@@ -1,7 +1,11 @@
 """HEP Dataframe"""
 from __future__ import annotations
 
-from typing import Any, Callable
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from numbers import Real
+from typing import Any, Callable, Mapping
 
 import awkward as ak
 import numpy as np
@@ -9,6 +13,67 @@ import numpy.typing as nptype
 
 from .hepdf_typing import MetaTypes
 
+# Below this number of events, groups are built sequentially by `groupby`. Selecting
+# a group costs about 0.1 ms of Python, holding the GIL, plus about 0.02 ms per 1000
+# events that can overlap in threads, while starting a thread pool costs about 0.07 ms.
+# From 100k events, the work that can overlap is over 20 times the cost of the pool.
+_PARALLEL_GROUPBY_MIN_EVENTS = 100_000
+
+
+def _record(
+    fields: Mapping[str, nptype.ArrayLike | ak.Array | ak.Record],
+    like: ak.Array | None = None,
+) -> ak.Array:
+    """Build a record array from `fields`, keeping the record parameters (e.g. its name) and the behavior of `like`."""
+    record = ak.Array(fields)
+    if like is None:
+        return record
+    for key, value in ak.type(like).type.parameters.items():
+        record = ak.with_parameter(record, key, value)
+    return ak.Array(record, behavior=like.behavior)
+
+
+def _merge_fields(
+    array: ak.Array | None,
+    fields: dict[str, nptype.ArrayLike | ak.Array | ak.Record],
+) -> ak.Array:
+    """Build, at once, a record array with the fields of `array` updated by `fields`."""
+    merged = {} if array is None else {name: array[name] for name in array.fields}
+    merged.update(fields)
+    return _record(merged, like=array)
+
+
+def _prepend_field(
+    array: ak.Array, name: str, field: nptype.ArrayLike | ak.Array
+) -> ak.Array:
+    """Build a record array with `field`, named `name`, followed by the fields of `array`."""
+    return _record(
+        {name: field, **{name_: array[name_] for name_ in array.fields}}, like=array
+    )
+
+
+def _boolean_mask(
+    filter_: nptype.ArrayLike | ak.Array | ak.Record, length: int
+) -> np.ndarray | None:
+    """Return `filter_` as a NumPy boolean mask, if it is a flat boolean array of `length` events."""
+    try:
+        mask = (
+            ak.to_numpy(filter_, allow_missing=False)
+            if isinstance(filter_, ak.Array)
+            else np.asarray(filter_)
+        )
+    except ValueError:
+        return None
+    if mask.dtype != np.bool_ or mask.shape != (length,):
+        return None
+    return mask
+
+
+def _pack_mask(mask: np.ndarray) -> np.ndarray:
+    """Pack a boolean mask into a bitmask, with 64 events per `uint64` word."""
+    packed = np.packbits(mask, bitorder="little")
+    return np.pad(packed, (0, -len(packed) % 8)).view(np.uint64)
+
 
 class HEPDataframe:
     """HEP Dataframe"""
@@ -26,42 +91,91 @@ class HEPDataframe:
 
     def __init__(self, data: ak.Record, **kwargs: MetaTypes) -> None:
         """Define a HEPDataframe."""
-        if (not isinstance(data, ak.Array)) and (not isinstance(data, ak.Record)):
+        if not isinstance(data, (ak.Array, ak.Record)):
             raise TypeError("Data should be an 'awkward.Record' or 'awkward.Array'.")
-        if not data.fields:
+        self._data_fields = tuple(data.fields)
+        if not self._data_fields:
             raise AttributeError(
                 "Data should have fields. Usually, 'awkward.Array' with fields are build from dicts or using 'awkward.zip' (https://awkward-array.readthedocs.io/en/latest/_auto/ak.zip.html)."
             )
 
         self.meta = kwargs
-        self.data = data
-        self.weights = ak.Array({"weight": np.ones(self.length)})
-        self.filters = ak.Array({"no_filter": np.full(self.length, True)})
+        self._data = data
+        self._length = len(data)
+        self._weights: ak.Array | None = None
+        self._nominal_scalar: float | None = 1.0
+        self._scalar_weights: dict[str, float] = {}
+        self._weight_fields: tuple[str, ...] = ("weight",)
+        self._filters: ak.Array | None = None
+        self._filters_sentinel_true = True
+        self._pending_columns: dict[str, nptype.ArrayLike | ak.Array | ak.Record] = {}
+        self._pending_weights: dict[str, nptype.ArrayLike | ak.Array | ak.Record] = {}
+        self._pending_filters: dict[str, nptype.ArrayLike | ak.Array | ak.Record] = {}
+        self._filter_bits: dict[str, np.ndarray] = {}
 
     @classmethod
-    def from_dataframe(cls, dataframe: HEPDataframe) -> HEPDataframe:
-        """Define a new HEPDataframe from another HEPDataframe."""
-        new_df = cls(data=dataframe.data, **dataframe.meta)
-        for weight_name in dataframe.weights.fields:
-            new_df.add_weight(weight_name, dataframe.weights[weight_name])
-        for filter_name in dataframe.filters.fields:
-            new_df.add_weight(filter_name, dataframe.filters[filter_name])
-        return new_df
+    def from_dataframe(
+        cls, dataframe: HEPDataframe, deep: bool = False
+    ) -> HEPDataframe:
+        """Define a new HEPDataframe from another HEPDataframe.
+        Data, weights and filters are shared with `dataframe`, unless `deep` is True."""
+        # pylint: disable=protected-access
+        data = dataframe.data
+        weights = dataframe._built_weights()
+        filters = dataframe._built_filters()
+        if deep:
+            data = ak.copy(data)
+            weights = None if weights is None else ak.copy(weights)
+            filters = None if filters is None else ak.copy(filters)
+        return cls._shallow_new(
+            data,
+            weights,
+            filters,
+            dataframe.meta,
+            dataframe._data_fields,
+            nominal_scalar=dataframe._nominal_scalar,
+            filters_sentinel_true=dataframe._filters_sentinel_true,
+            scalar_weights=dataframe._scalar_weights,
+            weight_fields=dataframe._weight_fields,
+        )
 
     @classmethod
-    def _from_data_weights_filters_meta(
-        cls, data: ak.Record, weights: ak.Array, filters: ak.Array, **kwargs: MetaTypes
+    def _shallow_new(
+        cls,
+        data: ak.Record,
+        weights: ak.Array | None,
+        filters: ak.Array | None,
+        meta: dict[str, MetaTypes],
+        data_fields: tuple[str, ...] | None = None,
+        nominal_scalar: float | None = None,
+        filters_sentinel_true: bool = False,
+        scalar_weights: Mapping[str, float] | None = None,
+        weight_fields: tuple[str, ...] | None = None,
     ) -> HEPDataframe:
-        """Define a new HEPDataframe from another HEPDataframe.
+        """Define a new HEPDataframe sharing already built data, weights and filters, without going through `__init__`.
+        `data_fields` can be given when the fields of `data` are already known.
+        `nominal_scalar` is the nominal weight, when it is not a field of `weights`.
+        `filters_sentinel_true` is True when the always true `no_filter` is not a field of `filters`.
+        `scalar_weights` are the weights, common to all events, that are not fields of `weights`.
+        `weight_fields` are the names of all the weights, in the order they were added.
         Users are not expected to use it."""
-        # TODO: Check if weights have a proper naming.
-        # TODO check types for all arguments.
-        # TODO: check if arguments have fields
-        new_df = cls(data=data, **kwargs)
-        for weight_name in weights.fields:
-            new_df.add_weight(weight_name, weights[weight_name])
-        for filter_name in filters.fields:
-            new_df.add_weight(filter_name, filters[filter_name])
+        new_df = cls.__new__(cls)
+        new_df.meta = dict(meta)
+        new_df._data = data
+        new_df._data_fields = tuple(data.fields) if data_fields is None else data_fields
+        new_df._length = len(data)
+        new_df._weights = weights
+        new_df._nominal_scalar = nominal_scalar
+        new_df._scalar_weights = {} if scalar_weights is None else dict(scalar_weights)
+        if weight_fields is None:
+            weight_fields = ("weight",) if weights is None else tuple(weights.fields)
+        new_df._weight_fields = weight_fields
+        new_df._filters = filters
+        new_df._filters_sentinel_true = filters_sentinel_true
+        new_df._pending_columns = {}
+        new_df._pending_weights = {}
+        new_df._pending_filters = {}
+        new_df._filter_bits = {}
         return new_df
 
     def add_meta(self, meta_info_name: str, meta_info: MetaTypes) -> HEPDataframe:
@@ -74,35 +188,151 @@ class HEPDataframe:
     def add_weight(
         self, weight_name: str, weight: nptype.ArrayLike | ak.Array | ak.Record
     ) -> HEPDataframe:
-        """Add a weight."""
+        """Add a weight. The nominal weight is the product of all added weights.
+        Weights are only merged into `weights` when it is next read, and scalar weights are only built into arrays then."""
         # TODO: Include systematics.
         # TODO: Check if is 1D
         # TODO: check if has no fields.
         # TODO: could be a callable.
-        self.weights[weight_name] = weight
-        # TODO: recompute nominal weights.
+        if weight_name == "weight":
+            raise ValueError(
+                "'weight' is the nominal weight, which is the product of all added weights. To set it explicitly, set `weights`, with a 'weight' field."
+            )
+        is_field = self._has_weight_field(weight_name)
+        readded = is_field or weight_name in self._scalar_weights
+        factor: float | np.ndarray | ak.Array
+        if isinstance(weight, Real) and not is_field:
+            factor = float(weight)
+            self._scalar_weights[weight_name] = factor
+        else:
+            if isinstance(weight, Real):
+                # Weights already built into arrays stay arrays.
+                weight = float(weight)
+            weight = self._per_event(weight_name, weight)
+            self._scalar_weights.pop(weight_name, None)
+            self._pending_weights[weight_name] = weight
+            factor = weight if isinstance(weight, ak.Array) else np.asarray(weight)
+
+        if weight_name not in self._weight_fields:
+            self._weight_fields += (weight_name,)
+        if readded:
+            # The replaced weight can not be divided out, as it may be zero.
+            self._set_nominal(self._product_of_weights())
+        else:
+            self._set_nominal(self.nominal_weight() * factor)
         return self
 
+    def nominal_weight(self) -> float | np.ndarray | ak.Array:
+        """Return the nominal weight. It is a scalar, common to all events, as long as only scalar weights were added."""
+        if self._nominal_scalar is not None:
+            return self._nominal_scalar
+        if "weight" in self._pending_weights:
+            return self._pending_weights["weight"]
+        # Without a scalar nominal weight, it is a field of the weights.
+        return self._built_weights()["weight"]  # type: ignore[index]
+
+    def _has_weight_field(self, weight_name: str) -> bool:
+        """Return True if `weight_name` is a field of the weights, pending or not."""
+        return weight_name in self._pending_weights or (
+            self._weights is not None and weight_name in self._weights.fields
+        )
+
+    def _product_of_weights(self) -> float | np.ndarray | ak.Array:
+        """Return the product of all added weights."""
+        product: float | np.ndarray | ak.Array = math.prod(
+            self._scalar_weights.values(), start=1.0
+        )
+        weights = self._built_weights()
+        if weights is not None:
+            for weight_name in weights.fields:
+                if weight_name != "weight":
+                    product = product * weights[weight_name]
+        return product
+
+    def _set_nominal(self, nominal: float | np.ndarray | ak.Array) -> None:
+        """Set the nominal weight. It stays a scalar until a weight field is needed to hold it."""
+        if self._nominal_scalar is None:
+            if isinstance(nominal, float):
+                nominal = np.full(self._length, nominal)
+            self._pending_weights["weight"] = nominal
+        elif isinstance(nominal, float):
+            self._nominal_scalar = nominal
+        else:
+            self._set_nominal_field(nominal)
+
+    def _set_nominal_field(self, nominal: np.ndarray | ak.Array) -> None:
+        """Replace the scalar nominal weight by `nominal`, as the first field of the weights."""
+        self._nominal_scalar = None
+        if self._weights is None:
+            self._pending_weights = {"weight": nominal, **self._pending_weights}
+        else:
+            self._weights = _prepend_field(self._weights, "weight", nominal)
+
     def add_column(
         self, column_name: str, column: nptype.ArrayLike | ak.Array | ak.Record
     ) -> HEPDataframe:
-        """Add a column."""
+        """Add a column. Columns are only merged into `data` when it is next read."""
         # TODO: check if has no fields.
         # TODO: could be a callable.
-        self.data[column_name] = column
+        self._pending_columns[column_name] = self._per_event(column_name, column)
+        if column_name not in self._data_fields:
+            self._data_fields += (column_name,)
         return self
 
     def add_filter(
         self, filter_name: str, filter_: nptype.ArrayLike | ak.Array | ak.Record
     ) -> HEPDataframe:
-        """Add a filter."""
+        """Add a filter. Filters are only merged into `filters` when it is next read."""
         # TODO: check if has no fields.
         # TODO: could be a callable.
         if not filter_name.startswith("filter"):
             filter_name = f"filter_{filter_name}"
-        self.filters[filter_name] = filter_
+        filter_ = self._per_event(filter_name, filter_)
+        self._pending_filters[filter_name] = filter_
+        mask = _boolean_mask(filter_, self._length)
+        if mask is None:
+            self._filter_bits.pop(filter_name, None)
+        else:
+            self._filter_bits[filter_name] = _pack_mask(mask)
         return self
 
+    def _per_event(
+        self, name: str, values: nptype.ArrayLike | ak.Array | ak.Record
+    ) -> nptype.ArrayLike | ak.Array | ak.Record:
+        """Return `values` with one entry per event. Scalars are broadcast, while a ValueError is raised for arrays of another length."""
+        if isinstance(values, (Real, np.bool_)):
+            return np.full(self._length, values)
+        length = len(values)  # type: ignore[arg-type]
+        if length != self._length:
+            raise ValueError(
+                f"'{name}' should have one entry per event ({self._length}), not {length}."
+            )
+        return values
+
+    def combined_mask(self, *filter_names: str) -> np.ndarray:
+        """Return, as a boolean mask, the events passing all the filters named `filter_names` (default: all filters).
+        Filters are combined as bitmasks, 64 events at a time. `no_filter`, always true, is skipped."""
+        filters = self._built_filters()
+        filter_fields = () if filters is None else tuple(filters.fields)
+        combined = np.full(-(-self._length // 64), np.iinfo(np.uint64).max, np.uint64)
+        for filter_name in filter_names or filter_fields:
+            if filter_name == "no_filter":
+                continue
+            bits = self._filter_bits.get(filter_name)
+            if bits is None:
+                if filters is None or filter_name not in filter_fields:
+                    raise KeyError(f"There is no filter named '{filter_name}'.")
+                mask = _boolean_mask(filters[filter_name], self._length)
+                if mask is None:
+                    raise TypeError(
+                        f"Filter '{filter_name}' should be a boolean array with one entry per event."
+                    )
+                bits = self._filter_bits[filter_name] = _pack_mask(mask)
+            np.bitwise_and(combined, bits, out=combined)
+        return np.unpackbits(
+            combined.view(np.uint8), count=self._length, bitorder="little"
+        ).view(np.bool_)
+
     def pipe(
         self,
         function_to_pipe: Callable,
@@ -116,12 +346,30 @@ class HEPDataframe:
     ) -> HEPDataframe:
         """Get events by index."""
         if isinstance(index, int):
-            index = [index]
+            if not -self._length <= index < self._length:
+                raise IndexError(f"Event index {index} is out of range.")
+            # A length 1 slice is a view, while `[index]` would copy the event.
+            index = slice(index, index + 1 or None)
         data = self.data[index]
-        weights = self.weights[index]
-        filters = self.filters[index]
-        return HEPDataframe._from_data_weights_filters_meta(
-            data, weights, filters, **self.meta
+        # Strings, or lists of strings, select fields instead of events.
+        if tuple(data.fields) != self._data_fields:
+            raise ValueError(f"Index {index!r} does not select events.")
+        weights = self._built_weights()
+        if weights is not None:
+            weights = weights[index]
+        filters = self._built_filters()
+        if filters is not None:
+            filters = filters[index]
+        return self._shallow_new(
+            data,
+            weights,
+            filters,
+            self.meta,
+            self._data_fields,
+            nominal_scalar=self._nominal_scalar,
+            filters_sentinel_true=self._filters_sentinel_true,
+            scalar_weights=self._scalar_weights,
+            weight_fields=self._weight_fields,
         )
 
     def __setitem__(self, key: Any, value: Any) -> None:
@@ -158,26 +406,156 @@ class HEPDataframe:
         # TODO: Check if 1D
         # TODO: Check if callable
 
-        groups = {}
-        for group_name, filter_ in filters.items():
-            groups[group_name] = self[filter_]
+        # Pending fields are merged first, so that groups can be built concurrently.
+        self._merge_pending()
+        workers = min(len(filters), os.cpu_count() or 1)
+        if workers >= 2 and self._length >= _PARALLEL_GROUPBY_MIN_EVENTS:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return GroupedDataframes(
+                    dict(zip(filters, executor.map(self.__getitem__, filters.values())))
+                )
+        return GroupedDataframes(
+            {group_name: self[filter_] for group_name, filter_ in filters.items()}
+        )
+
+    def _merge_pending(self) -> None:
+        """Merge the pending columns, weights and filters into their records."""
+        self.data  # pylint: disable=pointless-statement
+        self._built_weights()
+        self._built_filters()
+
+    def _built_weights(self) -> ak.Array | None:
+        """Return the weights, without building the scalar nominal weight, or None if there are none."""
+        if self._pending_weights:
+            self._weights = _merge_fields(self._weights, self._pending_weights)
+            self._pending_weights = {}
+        return self._weights
+
+    def _built_filters(self) -> ak.Array | None:
+        """Return the filters, without building the always true `no_filter`, or None if there are none."""
+        if self._pending_filters:
+            self._filters = _merge_fields(self._filters, self._pending_filters)
+            self._pending_filters = {}
+        return self._filters
 
-        return GroupedDataframes(groups)
+    @property
+    def data(self) -> ak.Record:
+        """Return the data, including columns added since it was last read."""
+        if self._pending_columns:
+            pending = self._pending_columns
+            if isinstance(ak.type(self._data).type, ak.types.RecordType):
+                # `_data_fields` already lists the fields of the merged data, in order.
+                self._data = _record(
+                    {
+                        name: pending[name] if name in pending else self._data[name]
+                        for name in self._data_fields
+                    },
+                    like=self._data,
+                )
+            else:
+                # Records nested in lists (or options) are updated one field at a time,
+                # broadcasting the columns into them. Replaced fields move to the end.
+                data = self._data
+                for name, column in pending.items():
+                    data = ak.with_field(data, column, name)
+                self._data = data
+                self._data_fields = tuple(data.fields)
+            self._pending_columns = {}
+        return self._data
+
+    @data.setter
+    def data(self, data: ak.Record) -> None:
+        """Set the data."""
+        self._data = data
+        self._data_fields = tuple(data.fields)
+        self._length = len(data)
+        self._pending_columns = {}
+
+    @property
+    def weights(self) -> ak.Array:
+        """Return the weights, in the order they were added. A scalar nominal weight, and scalar weights, are only built into arrays when first needed."""
+        weights = self._built_weights()
+        scalars = dict(self._scalar_weights)
+        if self._nominal_scalar is not None:
+            scalars["weight"] = self._nominal_scalar
+        # Weights replaced by arrays are merged at the end of the record, so it may need reordering.
+        if scalars or weights is None or tuple(weights.fields) != self._weight_fields:
+            fields: dict[str, np.ndarray | ak.Array] = (
+                {}
+                if weights is None
+                else {name: weights[name] for name in weights.fields}
+            )
+            fields.update(
+                (weight_name, np.full(self._length, value))
+                for weight_name, value in scalars.items()
+            )
+            self._weights = _record(
+                {
+                    weight_name: fields[weight_name]
+                    for weight_name in self._weight_fields
+                },
+                like=weights,
+            )
+            self._nominal_scalar = None
+            self._scalar_weights = {}
+        return self._weights
+
+    @weights.setter
+    def weights(self, weights: ak.Array) -> None:
+        """Set the weights. They should include the nominal weight, as `weight`."""
+        self._weights = weights
+        self._nominal_scalar = None
+        self._scalar_weights = {}
+        self._weight_fields = tuple(weights.fields)
+        self._pending_weights = {}
+
+    @property
+    def filters(self) -> ak.Array:
+        """Return the filters. The always true `no_filter` is only built into an array when first needed."""
+        if self._filters_sentinel_true:
+            self._filters_sentinel_true = False
+            no_filter = np.full(self._length, True)
+            if self._filters is None:
+                self._pending_filters = {
+                    "no_filter": no_filter,
+                    **self._pending_filters,
+                }
+            else:
+                self._filters = _prepend_field(self._filters, "no_filter", no_filter)
+        return self._built_filters()
+
+    @filters.setter
+    def filters(self, filters: ak.Array) -> None:
+        """Set the filters."""
+        self._filters = filters
+        self._filters_sentinel_true = False
+        self._pending_filters = {}
+        self._filter_bits = {}
 
     @property
     def length(self) -> int:
         """Return the number of events in the dataframe."""
-        return len(self.data)
+        return self._length
 
     def __str__(self) -> str:
         """HEPDataframe string representation."""
-        meta_str = "--> Meta:\n"
-        for met, val in self.meta.items():
-            meta_str += f"    {met}: {val}\n"
-        filters_str = "--> Filters\n"
-        for filter_name in self.filters.fields:
-            filters_str += f"    {filter_name}: {self.filters[filter_name]}\n"
-        return f"--> HEPDataframe: \n{meta_str[:-2]} \n--> Length: {self.length} \n--> Data (fields): {self.data.fields} \n--> Data: {self.data} \n--> Weights (fields): {self.weights.fields} \n--> Weights (nominal): {self.weights['weight']} \n{filters_str}"
+        meta_str = "\n".join(
+            ["--> Meta:", *(f"    {met}: {val}" for met, val in self.meta.items())]
+        )
+        # Reading the data first, since merging columns may reorder `_data_fields`.
+        data = self.data
+        # Scalar weights and `no_filter` are printed as scalars, so that printing does not build them.
+        filters_lines = ["--> Filters"]
+        if self._filters_sentinel_true:
+            filters_lines.append("    no_filter: True")
+        filters = self._built_filters()
+        if filters is not None:
+            filters_lines.extend(
+                f"    {filter_name}: {filters[filter_name]}"
+                for filter_name in filters.fields
+            )
+        filters_str = "\n".join(filters_lines)
+        return f"--> HEPDataframe: \n{meta_str} \n--> Length: {self.length} \n--> Data (fields): {list(self._data_fields)} \n--> Data: {data} \n--> Weights (fields): {list(self._weight_fields)} \n--> Weights (nominal): {self.nominal_weight()} \n{filters_str}\n"
 
     def __repr__(self) -> str:
         """HEPDataframe representation."""
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
 import awkward as ak
+import numpy as np
+import pytest
 
 import hepdataframe as hepdf
 
@@ -10,3 +12,289 @@ def test_length() -> None:
     test_array = ak.Array({"x": [1, 2, 3], "y": [[1, 2, 3, 4, 5], [1], []]})
     test_df = hepdf.HEPDataframe(test_array)
     assert test_df.length == 3
+
+
+def test_getitem_keeps_weights_and_filters() -> None:
+    """Test that slicing keeps weights and filters."""
+    test_array = ak.Array({"x": [1, 2, 3], "y": [[1, 2, 3, 4, 5], [1], []]})
+    test_df = hepdf.HEPDataframe(test_array, foo="bar")
+    test_df.add_weight("my_weight", [1.0, 2.0, 3.0])
+    test_df.add_filter("my_filter", [True, False, True])
+    sliced_df = test_df[1:]
+    assert sliced_df.length == 2
+    assert sliced_df.weights.fields == ["weight", "my_weight"]
+    assert sliced_df.weights["my_weight"].tolist() == [2.0, 3.0]
+    assert sliced_df.filters.fields == ["no_filter", "filter_my_filter"]
+    assert sliced_df.filters["filter_my_filter"].tolist() == [False, True]
+    assert sliced_df.meta == {"foo": "bar"}
+
+
+def test_add_column() -> None:
+    """Test that added columns are merged into data, keeping their order."""
+    test_array = ak.Array({"x": [1, 2, 3]})
+    test_df = hepdf.HEPDataframe(test_array)
+    test_df.add_column("y", [4, 5, 6]).add_column("z", [7, 8, 9])
+    test_df.add_column("x", [0, 0, 0])
+    assert test_df.data.fields == ["x", "y", "z"]
+    assert test_df.data.x.tolist() == [0, 0, 0]
+    assert test_df[1:].data.z.tolist() == [8, 9]
+
+
+def test_add_column_nested_records() -> None:
+    """Test that added columns are broadcast into records nested in lists."""
+    test_array = ak.Array([[{"x": 1}, {"x": 2}], []])
+    test_df = hepdf.HEPDataframe(test_array)
+    test_df.add_column("c", [1, 2]).add_column("x", [0, 0])
+    assert str(ak.type(test_df.data)) == '2 * var * {"c": int64, "x": int64}'
+    assert test_df.data.tolist() == [[{"c": 1, "x": 0}, {"c": 1, "x": 0}], []]
+    assert test_df[:1].data.c.tolist() == [[1, 1]]
+
+
+def test_add_scalar() -> None:
+    """Test that scalar columns and filters are broadcast to all events."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3]}))
+    test_df.add_column("c", 5).add_filter("f", True)
+    assert test_df.data.c.tolist() == [5, 5, 5]
+    assert test_df.filters["filter_f"].tolist() == [True, True, True]
+    assert test_df.combined_mask().tolist() == [True, True, True]
+
+
+def test_getitem_int() -> None:
+    """Test indexing a single event."""
+    test_array = ak.Array({"x": [1, 2, 3], "y": [[1, 2, 3, 4, 5], [1], []]})
+    test_df = hepdf.HEPDataframe(test_array)
+    assert test_df[0].data.x.tolist() == [1]
+    assert test_df[-1].data.x.tolist() == [3]
+    with pytest.raises(IndexError):
+        test_df[3]  # pylint: disable=pointless-statement
+
+
+def test_getitem_fields() -> None:
+    """Test that indices selecting fields, instead of events, are rejected."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3], "y": [4, 5, 6]}))
+    with pytest.raises(ValueError):
+        test_df["x"]  # pylint: disable=pointless-statement
+    with pytest.raises(ValueError):
+        test_df[["x"]]  # pylint: disable=pointless-statement
+
+
+def test_groupby() -> None:
+    """Test grouping events, with flat and jagged data."""
+    flat_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3], "z": [1.0, 2.0, 3.0]}))
+    flat_df.add_weight("my_weight", [1.0, 2.0, 3.0])
+    jagged_df = hepdf.HEPDataframe(
+        ak.Array({"x": [1, 2, 3], "y": [[1, 2, 3, 4, 5], [1], []]})
+    )
+    for test_df in (flat_df, jagged_df):
+        groups = test_df.groupby(
+            group_1=np.array([True, False, True]),
+            group_2=ak.Array([False, True, False]),
+            group_3=[0, 1],
+        )
+        assert groups["group_1"].data.x.tolist() == [1, 3]
+        assert groups["group_2"].data.x.tolist() == [2]
+        assert groups["group_3"].data.x.tolist() == [1, 2]
+        assert groups["group_1"].length == 2
+    assert groups["group_1"].data.y.tolist() == [[1, 2, 3, 4, 5], []]
+    assert flat_df.groupby(g=[False, True, True])["g"].weights[
+        "my_weight"
+    ].tolist() == [2.0, 3.0]
+
+
+def test_str() -> None:
+    """Test the string representation."""
+    # pylint: disable=protected-access
+    test_array = ak.Array({"x": [1, 2, 3]})
+    test_df = hepdf.HEPDataframe(test_array, foo="bar", answer=42)
+    test_df.add_filter("my_filter", [True, False, True])
+    test_df.add_weight("scale", 2)
+    test_str = str(test_df)
+    assert "--> Meta:\n    foo: bar\n    answer: 42 \n" in test_str
+    assert "--> Weights (fields): ['weight', 'scale'] \n" in test_str
+    assert "--> Weights (nominal): 2.0 \n" in test_str
+    assert test_str.endswith(
+        "--> Filters\n    no_filter: True\n    filter_my_filter: [True, False, True]\n"
+    )
+    # Printing does not build the scalar weights nor `no_filter`.
+    assert test_df._nominal_scalar == 2.0
+    assert test_df._scalar_weights == {"scale": 2.0}
+    assert test_df._filters_sentinel_true
+    test_df.add_weight("my_weight", [1.0, 2.0, 3.0])
+    assert "--> Weights (fields): ['weight', 'scale', 'my_weight'] \n" in str(test_df)
+
+
+def test_from_dataframe() -> None:
+    """Test defining a HEPDataframe from another one."""
+    test_array = ak.Array({"x": [1, 2, 3]})
+    test_df = hepdf.HEPDataframe(test_array, foo="bar")
+    test_df.add_weight("my_weight", [1.0, 2.0, 3.0])
+    test_df.add_filter("my_filter", [True, False, True])
+    for deep in (False, True):
+        new_df = hepdf.HEPDataframe.from_dataframe(test_df, deep=deep)
+        new_df.add_meta("new_meta", 1).add_column("y", [4, 5, 6])
+        assert new_df.weights.fields == ["weight", "my_weight"]
+        assert new_df.filters.fields == ["no_filter", "filter_my_filter"]
+        assert new_df.data.fields == ["x", "y"]
+    assert test_df.data.fields == ["x"]
+    assert test_df.meta == {"foo": "bar"}
+
+
+def test_combined_mask() -> None:
+    """Test combining filters."""
+    n_events = 100
+    test_df = hepdf.HEPDataframe(ak.Array({"x": np.arange(n_events)}))
+    test_df.add_filter("even", np.arange(n_events) % 2 == 0)
+    test_df.add_filter("small", ak.Array(np.arange(n_events) < 70))
+    assert test_df.combined_mask("no_filter").all()
+    assert (
+        test_df.combined_mask("filter_even") == (np.arange(n_events) % 2 == 0)
+    ).all()
+    assert np.flatnonzero(test_df.combined_mask()).tolist() == list(range(0, 70, 2))
+    assert test_df[50:].combined_mask().tolist() == [
+        x % 2 == 0 and x < 70 for x in range(50, n_events)
+    ]
+    test_df.add_filter("jagged", ak.Array([[True]] * n_events))
+    with pytest.raises(TypeError):
+        test_df.combined_mask("filter_jagged")
+
+
+def test_getitem_mask() -> None:
+    """Test selecting events with a boolean mask."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3], "z": [1.0, 2.0, 3.0]}))
+    test_df.add_filter("my_filter", [True, False, True])
+    masked_df = test_df[test_df.data.x > 1]
+    assert masked_df.data.z.tolist() == [2.0, 3.0]
+    assert masked_df.filters["filter_my_filter"].tolist() == [False, True]
+    assert test_df[[True, False, False]].data.x.tolist() == [1]
+
+
+def test_groupby_parallel(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test grouping events concurrently, with flat and jagged data."""
+    pools = []
+
+    class ThreadPoolExecutor(hepdf.hepdataframe.ThreadPoolExecutor):  # type: ignore[misc]
+        """Thread pool keeping track of its uses."""
+
+        def __init__(self, max_workers: int) -> None:
+            pools.append(max_workers)
+            super().__init__(max_workers=max_workers)
+
+    monkeypatch.setattr(hepdf.hepdataframe, "ThreadPoolExecutor", ThreadPoolExecutor)
+    monkeypatch.setattr(hepdf.hepdataframe, "_PARALLEL_GROUPBY_MIN_EVENTS", 0)
+    monkeypatch.setattr(hepdf.hepdataframe.os, "cpu_count", lambda: 2)
+    flat_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3], "z": [1.0, 2.0, 3.0]}))
+    jagged_df = hepdf.HEPDataframe(
+        ak.Array({"x": [1, 2, 3], "y": [[1, 2, 3, 4, 5], [1], []]})
+    )
+    for test_df in (flat_df, jagged_df):
+        test_df.add_weight("my_weight", [1.0, 2.0, 3.0])
+        groups = test_df.groupby(
+            group_1=np.array([True, False, True]),
+            group_2=test_df.data.x == 2,
+            group_3=[2],
+            group_4=[0, 1],
+        )
+        assert list(groups.dataframes) == ["group_1", "group_2", "group_3", "group_4"]
+        assert groups["group_1"].data.x.tolist() == [1, 3]
+        assert groups["group_2"].weights["my_weight"].tolist() == [2.0]
+        assert groups["group_3"].data.x.tolist() == [3]
+        assert groups["group_4"].data.x.tolist() == [1, 2]
+    assert groups["group_1"].data.y.tolist() == [[1, 2, 3, 4, 5], []]
+    assert pools == [2, 2]
+    # With a single CPU, groups are built sequentially.
+    monkeypatch.setattr(hepdf.hepdataframe.os, "cpu_count", lambda: 1)
+    assert jagged_df.groupby(a=[0], b=[1])["b"].data.x.tolist() == [2]
+    assert pools == [2, 2]
+
+
+def test_nominal_weight() -> None:
+    """Test that the nominal weight is the product of all added weights."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3]}))
+    assert test_df.nominal_weight() == 1.0
+    test_df.add_weight("scale", 2)
+    assert test_df.nominal_weight() == 2.0
+    sliced_df = test_df[1:]
+    assert sliced_df.nominal_weight() == 2.0
+    sliced_df.add_weight("my_weight", [3.0, 4.0])
+    assert sliced_df.weights.fields == ["weight", "scale", "my_weight"]
+    assert sliced_df.weights["weight"].tolist() == [6.0, 8.0]
+    assert sliced_df.weights["scale"].tolist() == [2.0, 2.0]
+    assert test_df.weights["weight"].tolist() == [2.0, 2.0, 2.0]
+    with pytest.raises(ValueError):
+        test_df.add_weight("weight", 2)
+
+
+def test_readd_weight() -> None:
+    """Test that a re-added weight replaces the old one in the nominal weight."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3]}))
+    test_df.add_weight("scale", 2).add_weight("scale", 3)
+    assert test_df.nominal_weight() == 3.0
+    test_df.add_weight("my_weight", [0.0, 1.0, 2.0])
+    test_df.add_weight("my_weight", [1.0, 2.0, 3.0])
+    assert test_df.nominal_weight() == pytest.approx([3.0, 6.0, 9.0])
+    assert test_df.weights.fields == ["weight", "scale", "my_weight"]
+    test_df.add_weight("scale", 1)
+    assert test_df.weights["weight"].tolist() == [1.0, 2.0, 3.0]
+    assert test_df.weights["scale"].tolist() == [1.0, 1.0, 1.0]
+    with pytest.raises(ValueError):
+        test_df.add_weight("other_weight", [2.0])
+    other_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2]}))
+    other_df.add_weight("a", 2).add_weight("b", [1.0, 2.0]).add_weight("a", [3.0, 4.0])
+    assert other_df.weights.fields == ["weight", "a", "b"]
+    assert other_df.weights["weight"].tolist() == [3.0, 8.0]
+
+
+def test_no_filter() -> None:
+    """Test that `no_filter` is only built when the filters are read."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3]}))
+    assert test_df.combined_mask().tolist() == [True, True, True]
+    test_df.add_filter("my_filter", [True, False, True])
+    sliced_df = test_df[1:]
+    assert sliced_df.combined_mask().tolist() == [False, True]
+    assert sliced_df.combined_mask("no_filter").tolist() == [True, True]
+    assert sliced_df.filters.fields == ["no_filter", "filter_my_filter"]
+    with pytest.raises(KeyError):
+        test_df.combined_mask("filter_unknown")
+
+
+def test_record_name() -> None:
+    """Test that selecting events keeps the record name and behavior of the data."""
+
+    class Momentum(ak.Record):  # type: ignore[misc]
+        """Dummy record behavior."""
+
+    behavior = {"Momentum": Momentum}
+    test_array = ak.zip(
+        {"px": [1.0, 2.0, 3.0], "py": [4.0, 5.0, 6.0]},
+        with_name="Momentum",
+        behavior=behavior,
+    )
+    test_df = hepdf.HEPDataframe(test_array)
+    mask = np.array([True, False, True])
+    for selected_df in (
+        test_df[1:],
+        test_df[mask],
+        test_df.groupby(group=mask)["group"],
+    ):
+        assert ak.type(selected_df.data).type.parameters == {"__record__": "Momentum"}
+        assert isinstance(selected_df.data[0], Momentum)
+
+
+def test_add_column_keeps_record_and_checks_length() -> None:
+    """Test that added columns keep the record name, and should have one entry per event."""
+    test_array = ak.zip({"px": [1.0, 2.0, 3.0]}, with_name="Momentum")
+    test_df = hepdf.HEPDataframe(test_array)
+    test_df.add_column("py", [4.0, 5.0, 6.0])
+    assert ak.parameters(test_df.data) == {"__record__": "Momentum"}
+    with pytest.raises(ValueError):
+        test_df.add_column("pz", [1.0, 2.0])
+    with pytest.raises(ValueError):
+        test_df.add_filter("my_filter", [True])
+    assert test_df.data.fields == ["px", "py"]
+
+
+def test_set_data() -> None:
+    """Test that setting the data updates the length."""
+    test_df = hepdf.HEPDataframe(ak.Array({"x": [1, 2, 3]}))
+    test_df.data = ak.Array({"x": [1]})
+    assert len(test_df) == 1